@@ -2,6 +2,8 @@ import { useState } from 'react'
 import SearchBar from './components/SearchBar'
 import SearchResult from './components/SearchResult'
 
+const POLL_INTERVAL_MS = 1000
+
 function App() {
   const [query, setQuery] = useState('')
   const [result, setResult] = useState(null)
@@ -19,7 +21,19 @@ function App() {
         },
         body: JSON.stringify({ query: searchQuery }),
       })
-      const data = await response.json()
+      if (!response.ok) throw new Error(`Query failed with status ${response.status}`)
+      let data = await response.json()
+
+      // The query runs in the background; poll until it has finished
+      while (data.status !== 'completed' && data.status !== 'failed') {
+        await new Promise((resolve) => setTimeout(resolve, POLL_INTERVAL_MS))
+        const poll = await fetch(`http://localhost:8000/query/${data.query_id}`)
+        if (!poll.ok) throw new Error(`Polling failed with status ${poll.status}`)
+        data = await poll.json()
+      }
+      if (data.status === 'failed') {
+        console.error('Search failed:', data.error)
+      }
       setResult(data)
     } catch (error) {
       console.error('Search error:', error)
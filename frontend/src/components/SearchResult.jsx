@@ -81,7 +81,7 @@ function SearchResult({ query, result, isSearching }) {
       ) : (
         <div className="text-[#ececec]">
           <div className="flex flex-row gap-3">
-            <Sparkles className="w-5 h-5 text-[#686b6e]" /><small className="italic text-gray-500">ready in {result?.processing_time.toFixed(2)} secs.</small>
+            <Sparkles className="w-5 h-5 text-[#686b6e]" />{result?.processing_time != null && <small className="italic text-gray-500">ready in {result.processing_time.toFixed(2)} secs.</small>}
           </div>
           <br />
           <span>{formatAnswer(result?.answer)}</span>
@@ -1,39 +1,64 @@
-from fastapi import FastAPI, HTTPException, BackgroundTasks, Request
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field
-import requests
-from bs4 import BeautifulSoup
+from pydantic import BaseModel, Field, field_serializer
+from selectolax.lexbor import LexborHTMLParser
 from typing import List, Dict, Optional
 import httpx
-from groq import Groq
+import msgspec
+from groq import AsyncGroq
+from cachetools import TTLCache
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_exponential
 from dotenv import load_dotenv
 import os
+import re
 import asyncio
-from datetime import datetime
+import hashlib
+import weakref
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime, timezone
 import uuid
 import logging
+import logging.handlers
+import queue
+import atexit
 import sys
 import time
 from asyncio import create_task, gather
+from contextlib import asynccontextmanager
+from urllib.parse import urlparse
 
-# Configure logging
+# Load environment variables
+load_dotenv()
+
+# Configure logging. Records are handed to a background thread through a
+# queue so console and file writes never block the event loop.
+log_queue = queue.SimpleQueue()
 logging.basicConfig(
-    level=logging.DEBUG,
+    level=os.getenv("LOG_LEVEL", "INFO").upper(),
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(sys.stdout),
-        logging.FileHandler('app.log')
-    ]
+    handlers=[logging.handlers.QueueHandler(log_queue)]
 )
+log_listener = logging.handlers.QueueListener(
+    log_queue,
+    logging.StreamHandler(sys.stdout),
+    logging.FileHandler('app.log')
+)
+log_listener.start()
+atexit.register(log_listener.stop)
 logger = logging.getLogger(__name__)
 
-# Load environment variables
-load_dotenv()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Close the shared HTTP client on shutdown
+    await searcher.http.aclose()
 
 app = FastAPI(
     title="Search and Answer API",
     description="An API that combines web search with Groq LLM for intelligent answers",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Add CORS middleware
@@ -45,8 +70,51 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Lifecycle states of a query
+QUERY_STATUSES = ("initiated", "searching", "completed", "failed")
+
+class QueryStore(TTLCache):
+    """
+    Bounded store for query results that keeps a running count per status
+    """
+    def __init__(self, maxsize: int, ttl: float):
+        super().__init__(maxsize=maxsize, ttl=ttl)
+        # Seed the known states so /status always reports every one of them
+        self.status_counts = Counter(dict.fromkeys(QUERY_STATUSES, 0))
+    
+    def __setitem__(self, query_id, query):
+        if query_id in self:
+            self.status_counts[self[query_id]["status"]] -= 1
+        super().__setitem__(query_id, query)
+        self.status_counts[query["status"]] += 1
+    
+    def __delitem__(self, query_id):
+        status = self[query_id]["status"]
+        super().__delitem__(query_id)
+        self.status_counts[status] -= 1
+    
+    def expire(self, time=None):
+        # Expired entries bypass __delitem__, so discount them here
+        expired = super().expire(time)
+        for _, query in expired:
+            self.status_counts[query["status"]] -= 1
+        return expired
+    
+    def update_query(self, query_id: str, fields: Dict):
+        """
+        Update a stored query in place, tracking any status transition
+        """
+        query = self.get(query_id)
+        if query is None:
+            # Evicted while still processing
+            return
+        if "status" in fields:
+            self.status_counts[query["status"]] -= 1
+            self.status_counts[fields["status"]] += 1
+        query.update(fields)
+
 # Store for keeping track of query results
-query_store = {}
+query_store = QueryStore(maxsize=10_000, ttl=86400)
 
 class QueryRequest(BaseModel):
     query: str = Field(..., description="The search query to process")
@@ -58,35 +126,71 @@ class QueryResponse(BaseModel):
     query: str
     answer: Optional[str] = None
     sources: Optional[List[Dict[str, str]]] = None
-    created_at: datetime
+    created_at: float
     error: Optional[str] = None
     processing_time: Optional[float] = None
-    last_updated: datetime
+    last_updated: float
+    
+    @field_serializer("created_at", "last_updated", return_type=datetime)
+    def serialize_timestamp(self, timestamp: float) -> datetime:
+        # Timestamps are stored as epoch seconds and only converted on output
+        return datetime.fromtimestamp(timestamp, timezone.utc).replace(tzinfo=None)
+
+class OrganicResult(msgspec.Struct, gc=False):
+    """
+    A single organic result from the Serper search response
+    """
+    title: str = ""
+    link: str = ""
+    snippet: str = ""
+
+class SerperResponse(msgspec.Struct, gc=False):
+    """
+    The parts of the Serper search response we use; other fields are ignored
+    """
+    organic: List[OrganicResult] = []
+
+@dataclass(slots=True)
+class Hit:
+    """
+    A search result and the prompt excerpt of the page fetched for it
+    """
+    url: str
+    title: str
+    snippet: str
+    content: str = ""
 
 class ContentVerifier:
     """
     Helper class to verify and validate content credibility
     """
+    # Red flags in URLs
+    suspicious_patterns = re.compile('|'.join(map(re.escape, [
+        'free-download',
+        'miracle-solution',
+        'secret-revealed',
+        'one-weird-trick',
+        'spam',
+        'scam'
+    ])))
+    
+    # Spam-like phrases in page content, matched case-insensitively
+    spam_patterns = re.compile('|'.join(map(re.escape, [
+        'click here',
+        'buy now',
+        'limited time offer',
+        'act now',
+        '100% guaranteed'
+    ])), re.IGNORECASE)
+    
     @staticmethod
     def is_credible_domain(url: str) -> bool:
         """
         Check if the domain is from a generally credible source
         """
         try:
-            from urllib.parse import urlparse
             domain = urlparse(url).netloc.lower()
-            
-            # Red flags in URLs
-            suspicious_patterns = [
-                'free-download',
-                'miracle-solution',
-                'secret-revealed',
-                'one-weird-trick',
-                'spam',
-                'scam'
-            ]
-            
-            return not any(pattern in domain for pattern in suspicious_patterns)
+            return not ContentVerifier.suspicious_patterns.search(domain)
         except:
             return False
     
@@ -99,16 +203,28 @@ class ContentVerifier:
             return False
             
         # Check for spam-like patterns
-        spam_patterns = [
-            'click here',
-            'buy now',
-            'limited time offer',
-            'act now',
-            '100% guaranteed'
-        ]
-        
-        return not any(pattern in text.lower() for pattern in spam_patterns)
+        return not ContentVerifier.spam_patterns.search(text)
     
+# Seconds allowed for a page fetch; the Groq rerank shares the same window
+FETCH_TIMEOUT = 10.0
+
+# Maximum number of bytes read from a fetched page
+MAX_PAGE_BYTES = 512 * 1024
+
+# Characters of each source's page text included in the Groq prompt
+PROMPT_CHARS_PER_SOURCE = 1000
+
+# Elements whose text never counts as page content
+SKIPPED_TAGS = ['script', 'style', 'header', 'footer', 'nav', 'noscript', 'svg', 'aside', 'form', 'iframe']
+
+def is_transient_error(exc: BaseException) -> bool:
+    """
+    Check if a request error is worth retrying (timeouts and 5xx responses)
+    """
+    if isinstance(exc, httpx.TimeoutException):
+        return True
+    return isinstance(exc, httpx.HTTPStatusError) and exc.response.status_code >= 500
+
 class WebSearcher:
     def __init__(self, groq_api_key: str = None, serper_api_key: str = None):
         self.groq_api_key = groq_api_key or os.getenv("GROQ_API_KEY")
@@ -118,62 +234,180 @@ class WebSearcher:
             raise ValueError("Missing required API keys. Please set GROQ_API_KEY and SERPER_API_KEY in .env file")
         
         logger.info("Initializing WebSearcher with API keys")
-        self.groq_client = Groq(api_key=self.groq_api_key)
+        self.groq_client = AsyncGroq(api_key=self.groq_api_key)
         self.headers = {
             'X-API-KEY': self.serper_api_key,
             'Content-Type': 'application/json'
         }
         
+        # Shared HTTP client so fetches reuse pooled (HTTP/2) connections
+        self.http = httpx.AsyncClient(
+            http2=True,
+            timeout=FETCH_TIMEOUT,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=50),
+            headers={'User-Agent': 'Mozilla/5.0 (compatible; Goleki/1.0; +https://github.com/wansatya/goleki)'}
+        )
+        
+        # Cache Serper results; per-key locks stop concurrent identical queries
+        # from each hitting the API
+        self._search_cache = TTLCache(maxsize=1024, ttl=int(os.getenv("SEARCH_CACHE_TTL", "3600")))
+        self._search_locks = weakref.WeakValueDictionary()
+        
+        # Cache extracted page text per URL, coalescing concurrent fetches
+        self._page_cache = TTLCache(maxsize=4096, ttl=int(os.getenv("PAGE_CACHE_TTL", "900")))
+        self._page_locks = weakref.WeakValueDictionary()
+        
         self.content_verifier = ContentVerifier()
     
-    def search_web(self, query: str, num_results: int = 5) -> List[Dict]:
+    async def search_web(self, query: str, num_results: int = 5) -> List[OrganicResult]:
         """
         Perform a web search using Serper API
         """
-        url = "https://google.serper.dev/search"
         payload = {
             'q': query,
             'num': num_results
         }
         
-        logger.debug(f"Searching web for query: {query}")
+        key = hashlib.blake2b(f"{query}|{num_results}".encode(), digest_size=16).digest()
+        lock = self._search_locks.setdefault(key, asyncio.Lock())
+        
         try:
-            response = requests.post(url, headers=self.headers, json=payload)
-            response.raise_for_status()
-            results = response.json()
-            logger.debug(f"Found {len(results.get('organic', []))} search results")
-            return results.get('organic', [])
+            async with lock:
+                if key in self._search_cache:
+                    logger.debug("Search cache hit for query: %s", query)
+                    return self._search_cache[key]
+                
+                logger.debug("Search cache miss, searching web for query: %s", query)
+                organic = (await self._post_search(payload)).organic
+                logger.debug("Found %d search results", len(organic))
+                self._search_cache[key] = organic
+                return organic
         except Exception as e:
             logger.error(f"Error in web search: {str(e)}")
             raise
 
+    @retry(
+        retry=retry_if_exception(is_transient_error),
+        stop=stop_after_attempt(5),
+        wait=wait_exponential(multiplier=0.5, max=8),
+        reraise=True
+    )
+    async def _post_search(self, payload: Dict) -> SerperResponse:
+        """
+        Send the search request to Serper, retrying transient failures
+        """
+        response = await self.http.post(
+            "https://google.serper.dev/search",
+            headers=self.headers,
+            content=msgspec.json.encode(payload)
+        )
+        response.raise_for_status()
+        return msgspec.json.decode(response.content, type=SerperResponse)
+
+    @staticmethod
+    def _extract_text(html: bytes, charset: Optional[str] = None, max_chars: int = 4000) -> str:
+        """
+        Extract cleaned, truncated text content from raw HTML in a single pass
+        """
+        # A charset from the Content-Type header takes precedence; otherwise
+        # lexbor detects it from a BOM or <meta> declaration in the bytes
+        document = html
+        if charset:
+            try:
+                document = html.decode(charset, errors='replace')
+            except LookupError:
+                logger.debug("Unknown charset %s, detecting from document", charset)
+        tree = LexborHTMLParser(document, encoding=True)
+        
+        # Remove script, style and page chrome elements along with their children
+        tree.strip_tags(SKIPPED_TAGS)
+        
+        lines = []
+        total = 0
+        body = tree.body or tree.root
+        for node in body.traverse(include_text=True):
+            if not node.is_text_node:
+                continue
+            for line in filter(None, map(str.strip, node.text(deep=False).split('\n'))):
+                lines.append(line)
+                total += len(line) + 1
+            # Stop walking once enough text has been collected
+            if total >= max_chars:
+                break
+        
+        return '\n'.join(lines)[:max_chars]
+
     async def fetch_webpage_content(self, url: str) -> str:
         """
         Fetch and extract main content from a webpage
         """
-        logger.debug(f"Fetching content from URL: {url}")
-        try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(url, timeout=10.0)
-                response.raise_for_status()
-                soup = BeautifulSoup(response.text, 'html.parser')
-                
-                # Remove script and style elements
-                for script in soup(['script', 'style', 'header', 'footer', 'nav']):
-                    script.decompose()
-                
-                # Get text content
-                text = soup.get_text(separator='\n', strip=True)
+        lock = self._page_locks.setdefault(url, asyncio.Lock())
+        
+        async with lock:
+            if url in self._page_cache:
+                logger.debug("Page cache hit for URL: %s", url)
+                return self._page_cache[url]
+            
+            logger.debug("Fetching content from URL: %s", url)
+            try:
+                # Stream the body and stop reading once the byte cap is reached
+                async with self.http.stream("GET", url) as response:
+                    response.raise_for_status()
+                    chunks = []
+                    total = 0
+                    async for chunk in response.aiter_bytes(65536):
+                        chunks.append(chunk)
+                        total += len(chunk)
+                        if total >= MAX_PAGE_BYTES:
+                            break
+                body = b"".join(chunks)
                 
-                # Basic text cleaning
-                lines = [line.strip() for line in text.splitlines() if line.strip()]
-                text = '\n'.join(lines)
+                # Parse off the event loop so sibling fetches keep progressing
+                text = await asyncio.to_thread(self._extract_text, body, response.charset_encoding)
                 
-                logger.debug(f"Successfully extracted {len(text)} characters from {url}")
-                return text[:4000]
+                # Only successful extractions are cached so failures can be retried
+                self._page_cache[url] = text
+                return text
+            except Exception as e:
+                logger.error(f"Error fetching content from {url}: {str(e)}")
+                return f"Error fetching content: {str(e)}"
+
+    async def _rank_candidates(self, user_query: str, hits: List[Hit]):
+        """
+        Rerank hits within the fetch window, falling back to search order
+        """
+        if not hits:
+            return []
+        try:
+            return await asyncio.wait_for(self._groq_rerank(user_query, hits), timeout=FETCH_TIMEOUT)
         except Exception as e:
-            logger.error(f"Error fetching content from {url}: {str(e)}")
-            return f"Error fetching content: {str(e)}"
+            logger.error(f"Error ranking search results: {str(e) or type(e).__name__}")
+            return range(len(hits))
+
+    async def _groq_rerank(self, user_query: str, hits: List[Hit]) -> List[int]:
+        """
+        Order search hits by relevance to the query based on their snippets
+        """
+        listing = "\n".join(f"{idx}. {hit.title}: {hit.snippet}" for idx, hit in enumerate(hits))
+        completion = await self.groq_client.chat.completions.create(
+            model=os.getenv("GROQ_MODEL"),
+            messages=[
+                {"role": "system", "content": "You rank web search results by how well they answer a question. Reply only with the result numbers, most relevant first, separated by commas."},
+                {"role": "user", "content": f"Question: {user_query}\n\nSearch Results:\n{listing}"}
+            ],
+            temperature=0,
+            max_tokens=64
+        )
+        
+        ranked = []
+        for number in re.findall(r'\d+', completion.choices[0].message.content or ''):
+            idx = int(number)
+            if idx < len(hits) and idx not in ranked:
+                ranked.append(idx)
+        
+        # Keep results the model left out, in their original order
+        ranked.extend(idx for idx in range(len(hits)) if idx not in ranked)
+        return ranked
 
     async def process_query(self, user_query: str, num_results: int = 3) -> Dict:
         """
@@ -182,7 +416,7 @@ class WebSearcher:
         logger.info(f"Processing query: {user_query}")
         try:
             # Search the web
-            search_results = self.search_web(user_query, num_results * 2)  # Get more results for filtering
+            search_results = await self.search_web(user_query, num_results * 2)  # Get more results for filtering
             if not search_results:
                 logger.warning("No search results found")
                 return {
@@ -190,37 +424,45 @@ class WebSearcher:
                     "sources": []
                 }
             
-            # Filter and verify sources
-            verified_contents = []
-            verified_sources = []
+            # Filter sources by credibility, then fetch all candidates concurrently
+            candidates = [
+                Hit(result.link, result.title, result.snippet)
+                for result in search_results
+                if result.link and self.content_verifier.is_credible_domain(result.link)
+            ][:num_results * 2]
+            
+            # Rank snippets with Groq while the pages are being fetched
+            ranked, *pages = await gather(
+                self._rank_candidates(user_query, candidates),
+                *(self.fetch_webpage_content(hit.url) for hit in candidates),
+                return_exceptions=True
+            )
+            
+            # Verify content quality, most relevant sources first
+            hits = []
             
-            for result in search_results:
-                if 'link' in result and self.content_verifier.is_credible_domain(result['link']):
-                    content = await self.fetch_webpage_content(result['link'])
+            for idx in ranked:
+                hit, content = candidates[idx], pages[idx]
+                if isinstance(content, BaseException):
+                    logger.error(f"Error fetching content from {hit.url}: {str(content)}")
+                    continue
+                
+                if self.content_verifier.check_content_quality(content):
+                    # Only the prompt excerpt is kept past the quality check
+                    hit.content = content[:PROMPT_CHARS_PER_SOURCE]
+                    hits.append(hit)
                     
-                    if self.content_verifier.check_content_quality(content):
-                        verified_contents.append({
-                            'url': result['link'],
-                            'title': result.get('title', ''),
-                            'content': content
-                        })
-                        verified_sources.append({
-                            'url': result['link'],
-                            'title': result.get('title', ''),
-                            'snippet': result.get('snippet', '')
-                        })
-                        
-                        if len(verified_contents) >= num_results:
-                            break
+                    if len(hits) >= num_results:
+                        break
             
-            if not verified_contents:
+            if not hits:
                 return {
                     "answer": "I found some results but couldn't verify their reliability. Please try rephrasing your query.",
                     "sources": []
                 }
             
             # Prepare prompt with enhanced verification instructions
-            prompt = f"""Based on the following verified web search results, please answer this question: {user_query}
+            prompt_parts = [f"""Based on the following verified web search results, please answer this question: {user_query}
 
             Instructions:
                 1. Analyze information critically and look for consensus among sources
@@ -230,38 +472,47 @@ class WebSearcher:
                 5. Don't make definitive claims about controversial topics
 
             Search Results:
-            """
+            """]
             
-            for idx, content in enumerate(verified_contents, 1):
-                prompt += f"\nSource {idx}: {content['title']}\nURL: {content['url']}\n{content['content'][:1000]}\n"
+            for idx, hit in enumerate(hits, 1):
+                prompt_parts.append(f"\nSource {idx}: {hit.title}\nURL: {hit.url}\n")
+                prompt_parts.append(hit.content)
+                prompt_parts.append("\n")
+            prompt = "".join(prompt_parts)
             
             # Two-step verification with Groq
-            # First: Generate initial answer
-            completion = self.groq_client.chat.completions.create(
+            # First: Generate initial answer, streamed straight into the
+            # verification prompt as the chunks arrive
+            verification_parts = ["""Please verify and refine this answer, considering:
+            1. Are all claims properly supported by the sources?
+            2. Are there any logical inconsistencies?
+            3. Are uncertainties appropriately acknowledged?
+            4. Is the tone appropriately balanced?
+
+            Original Answer:
+            """]
+            
+            stream = await self.groq_client.chat.completions.create(
                 model=os.getenv("GROQ_MODEL"),
                 messages=[
                     {"role": "system", "content": "You are a helpful assistant that provides accurate, well-sourced answers based on verified web search results. Always maintain a skeptical mindset and acknowledge uncertainties."},
                     {"role": "user", "content": prompt}
                 ],
                 temperature=0.3,
-                max_tokens=1500
+                max_tokens=1500,
+                stream=True
             )
-            
-            initial_answer = completion.choices[0].message.content
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    verification_parts.append(chunk.choices[0].delta.content)
             
             # Second: Verify and refine the answer
-            verification_prompt = f"""Please verify and refine this answer, considering:
-            1. Are all claims properly supported by the sources?
-            2. Are there any logical inconsistencies?
-            3. Are uncertainties appropriately acknowledged?
-            4. Is the tone appropriately balanced?
-
-            Original Answer:
-            {initial_answer}
+            verification_parts.append("""
 
-            Please provide a refined version that addresses any issues found."""
+            Please provide a refined version that addresses any issues found.""")
+            verification_prompt = "".join(verification_parts)
 
-            verification = self.groq_client.chat.completions.create(
+            verification = await self.groq_client.chat.completions.create(
                 model=os.getenv("GROQ_MODEL"),
                 messages=[
                     {"role": "system", "content": "You are a critical fact-checker. Your job is to verify information and ensure accurate, well-balanced responses."},
@@ -276,7 +527,7 @@ class WebSearcher:
             
             return {
                 "answer": final_answer,
-                "sources": verified_sources,
+                "sources": [{'url': hit.url, 'title': hit.title, 'snippet': hit.snippet} for hit in hits],
                 "verification_note": "This response has been verified for accuracy and credibility."
             }
         except Exception as e:
@@ -287,15 +538,21 @@ class TaskManager:
     def __init__(self):
         self.tasks = {}
         
-    async def add_task(self, query_id: str, coro):
-        task = create_task(coro)
+    def add_task(self, query_id: str, coro):
+        """
+        Schedule a coroutine in the background without waiting for it
+        """
+        task = create_task(self._run(query_id, coro))
         self.tasks[query_id] = task
+        return task
+    
+    async def _run(self, query_id: str, coro):
         try:
-            await task
+            await coro
         except Exception as e:
             logger.error(f"Task failed for query_id {query_id}: {str(e)}")
         finally:
-            del self.tasks[query_id]
+            self.tasks.pop(query_id, None)
 
 task_manager = TaskManager()
 
@@ -308,66 +565,75 @@ except Exception as e:
 
 async def process_query_background(query_id: str, query: str, num_results: int):
     logger.info(f"Starting background processing for query_id: {query_id}")
-    start_time = time.time()
+    start_time = time.perf_counter()
     
     try:
         # Update status to show processing has started
-        query_store[query_id].update({
+        query_store.update_query(query_id, {
             "status": "searching",
-            "last_updated": datetime.utcnow()
+            "last_updated": time.time()
         })
         
         result = await searcher.process_query(query, num_results)
         
         # Log the completion time
-        processing_time = time.time() - start_time
+        processing_time = time.perf_counter() - start_time
         logger.info(f"Query {query_id} completed in {processing_time:.2f} seconds")
         
-        query_store[query_id].update({
+        query_store.update_query(query_id, {
             "status": "completed",
             "answer": result["answer"],
             "sources": result["sources"],
-            "last_updated": datetime.utcnow(),
+            "last_updated": time.time(),
             "processing_time": processing_time
         })
         
     except Exception as e:
         error_msg = str(e)
         logger.error(f"Error processing query_id {query_id}: {error_msg}", exc_info=True)
-        query_store[query_id].update({
+        query_store.update_query(query_id, {
             "status": "failed",
             "error": error_msg,
-            "last_updated": datetime.utcnow()
+            "last_updated": time.time()
         })
 
+def query_response(query: Dict) -> Response:
+    """
+    Serialize a stored query without re-validating the server-owned record
+    """
+    body = QueryResponse.model_construct(**query).model_dump_json()
+    # Returning a Response directly also skips FastAPI's response_model pass
+    return Response(content=body, media_type="application/json")
+
 @app.post("/query", response_model=QueryResponse)
-async def create_query(query_request: QueryRequest, background_tasks: BackgroundTasks):
+async def create_query(query_request: QueryRequest):
     query_id = str(uuid.uuid4())
     logger.info(f"Received new query. ID: {query_id}, Query: {query_request.query}")
     
+    now = time.time()
     query_store[query_id] = {
         "query_id": query_id,
         "status": "initiated",
         "query": query_request.query,
-        "created_at": datetime.utcnow(),
-        "last_updated": datetime.utcnow(),
+        "created_at": now,
+        "last_updated": now,
         "error": None,
         "answer": None,
         "sources": None,
         "processing_time": None
     }
     
-    # Create and track the background task
-    await task_manager.add_task(
+    # Start the background task; clients poll GET /query/{query_id} for the result
+    task_manager.add_task(
         query_id,
         process_query_background(query_id, query_request.query, query_request.num_results)
     )
     
-    return QueryResponse(**query_store[query_id])
+    return query_response(query_store[query_id])
 
 @app.get("/query/{query_id}", response_model=QueryResponse)
 async def get_query_result(query_id: str):
-    logger.debug(f"Fetching results for query_id: {query_id}")
+    logger.debug("Fetching results for query_id: %s", query_id)
     if query_id not in query_store:
         logger.warning(f"Query ID not found: {query_id}")
         raise HTTPException(status_code=404, detail="Query not found")
@@ -379,21 +645,20 @@ async def get_query_result(query_id: str):
         task = task_manager.tasks[query_id]
         if task.done():
             if task.exception():
-                result["status"] = "failed"
-                result["error"] = str(task.exception())
+                query_store.update_query(query_id, {
+                    "status": "failed",
+                    "error": str(task.exception())
+                })
     
-    logger.debug(f"Query status: {result['status']}")
-    return QueryResponse(**result)
+    logger.debug("Query status: %s", result["status"])
+    return query_response(result)
 
 @app.get("/status")
 async def get_system_status():
     return {
         "active_tasks": len(task_manager.tasks),
         "total_queries": len(query_store),
-        "queries_by_status": {
-            status: len([q for q in query_store.values() if q["status"] == status])
-            for status in set(q["status"] for q in query_store.values())
-        }
+        "queries_by_status": dict(query_store.status_counts)
     }
 
 @app.get("/health")
@@ -407,12 +672,29 @@ async def health_check():
 # Add middleware to log request timing
 @app.middleware("http")
 async def add_process_time_header(request: Request, call_next):
-    start_time = time.time()
+    start_time = time.perf_counter()
     response = await call_next(request)
-    process_time = time.time() - start_time
+    process_time = time.perf_counter() - start_time
     response.headers["X-Process-Time"] = str(process_time)
+    logger.info("%s %s %d %.3fs", request.method, request.url.path, response.status_code, process_time)
     return response
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    # With uvicorn[standard] installed, "auto" picks uvloop and httptools
+    # (falling back to asyncio/h11 where they are unavailable, e.g. Windows).
+    # Query results live in process memory, so WEB_CONCURRENCY > 1 needs
+    # sticky routing or a shared store for GET /query/{query_id} to work.
+    workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+    uvicorn.run(
+        # Worker processes need an import string; a single process serves
+        # this module's app directly instead of importing it a second time
+        "main:app" if workers > 1 else app,
+        host="0.0.0.0",
+        port=8000,
+        loop="auto",
+        http="auto",
+        workers=workers,
+        # Requests are logged by the timing middleware
+        access_log=False
+    )
\ No newline at end of file